@@ -1,95 +1,107 @@
-from datetime import date
+import argparse
+from datetime import date, datetime
 from pathlib import Path
-from typing import List
+from typing import Callable, List
 
 import matplotlib.pyplot as plt
 import pandas as pd
 import seaborn as sns
 import streamlit as st
 
-from data import inference
+from data import history, inference, serve
+from data.line_partitions import write_line_partitions
 from data.nhs_crawler import get_data_sources, get_sheet
+from data.output import write_csv, write_if_changed
 from data.parse import parse
 from data.population import add_population
+from data.rollup import rollup, rollups
 from data.types import (
     Group,
     Location,
+    Source,
     Vaccinated,
     ALL_LOCATIONS,
 )
 
 OUTPUT_LATEST_DATA = Path("public/latest.csv")
 OUTPUT_LINE_DATA = Path("public/line.csv")
+OUTPUT_LINE_PARTITIONS = Path("public/line")
 OUTPUT_FRESHNESS = Path("public/freshness.txt")
-
-
-def main():
+__LATEST_COLUMNS = ["dose", "group", "vaccinated", "interpolated", "extrapolated"]
+__LINE_COLUMNS = ["dose", "real_date", "extrapolated", "vaccinated", "interpolated", "group"]
+__LATEST_SORT = ["dose", "group"]
+__LINE_SORT = ["real_date", "dose", "extrapolated"]
+
+
+def main(
+    memoize: Callable[[Callable], Callable] = lambda f: f,
+    write_outputs: bool = True,
+    write_local_outputs: bool = False,
+):
+    # Each stage is wrapped in `memoize`, so that interactive runs can cache stages on their inputs.
     st.header("vaxtldr data fetching")
 
-    data_sources = list(get_data_sources())
+    today = date.today()
+    data_sources = memoize(__crawl)(today)
 
     st.write("Parsing vaccinated")
-    vaccinated_by_source = {
-        source: list(parse(source, get_sheet(source))) for source in data_sources
-    }
+    vaccinated_by_source = {source: memoize(__parse_source)(source) for source in data_sources}
     for source, vaccinated in vaccinated_by_source.items():
         assert len(vaccinated) > 0, f"Data source didn't return any data: {source}"
     vaccinated: List[Vaccinated] = [v for vs in vaccinated_by_source.values() for v in vs]
-    # We don't currently use location data, so just get rid of it all.
-    vaccinated = [v for v in vaccinated if v.slice.location == ALL_LOCATIONS]
+    records = history.records_to_df(vaccinated)
 
     st.write("Deaggregating")
-    vaccinated = inference.add_deaggregates(vaccinated)
-    vaccinated = list(inference.remove_aggregates(vaccinated))
-
-    today = date.today()
-    latest = max(v.source.real_date for v in vaccinated if not v.extrapolated)
-    OUTPUT_FRESHNESS.write_text(today.strftime("%Y-%m-%d") + " " + latest.strftime("%Y-%m-%d"))
+    vaccinated = memoize(__deaggregate)(vaccinated)
+    latest_data_date = max(v.source.real_date for v in vaccinated if not v.extrapolated)
 
     st.write("Adding dose 2 + 2 weeks")
-    vaccinated_with_ages = inference.add_dose_2_wait(vaccinated)
-
-    df_with_ages = vaccinated_to_df(vaccinated_with_ages)
-
-    latest_underlying = df_with_ages[~df_with_ages["extrapolated"]]
-    latest_date = latest_underlying["real_date"].max()
-    latest_over_80 = (
-        latest_underlying[latest_underlying["real_date"] == latest_date]
-        .groupby(["dose", "group"])
-        .sum("vaccinated")
-        .reset_index()
-    )
-    st.write(latest_over_80)
-    latest_all_groups = (
-        latest_underlying[(latest_underlying["real_date"] == latest_date)]
-        .groupby("dose")
-        .sum("vaccinated")
-        .reset_index()
-    )
-    latest_all_groups["group"] = "all"
-    latest = pd.concat([latest_over_80, latest_all_groups])
+    vaccinated_with_ages = memoize(inference.add_dose_2_wait)(vaccinated)
+
+    latest_date = max(v.source.real_date for v in vaccinated_with_ages if not v.extrapolated)
+    latest_underlying = [
+        v
+        for v in vaccinated_with_ages
+        if not v.extrapolated and v.source.real_date == latest_date
+    ]
+    latest_by_group, latest_all_groups = rollups(latest_underlying, [["dose", "group"], ["dose"]])
+    st.write(vaccinated_to_df(latest_by_group))
+    latest = vaccinated_to_df(latest_by_group + latest_all_groups)[__LATEST_COLUMNS]
     latest = add_population(latest)
-    latest = latest.sort_values(by="group", ascending=False)
-    latest = latest.sort_values(by="dose", ascending=False)
-    latest.to_csv(OUTPUT_LATEST_DATA)
     st.write(latest)
 
     st.write("Aggregating across ages")
     st.write(vaccinated_to_df(vaccinated))
-    vaccinated = inference.aggregate_ages(vaccinated)
+    vaccinated = memoize(inference.aggregate_ages)(vaccinated)
     st.write(vaccinated_to_df(vaccinated))
     st.write("Adding extrapolations")
-    vaccinated = list(inference.add_extrapolations(vaccinated))
+    vaccinated = memoize(__extrapolate)(vaccinated)
     st.write("Adding dose 2 + 2 weeks")
-    vaccinated = inference.add_dose_2_wait(vaccinated)
+    vaccinated = memoize(inference.add_dose_2_wait)(vaccinated)
     df = vaccinated_to_df(vaccinated)
 
-    line = df.groupby(["dose", "real_date", "extrapolated"]).sum().reset_index()
-    line["group"] = "all"
+    line = rollup(vaccinated, ["dose", "real_date", "extrapolated"])
+    line = vaccinated_to_df(line)[__LINE_COLUMNS]
     line = add_population(line)
     line["vaccinated"] = line[["vaccinated", "population"]].min(axis=1)
-    line = line.sort_values(by="real_date")
-    line.to_csv(OUTPUT_LINE_DATA)
+    line = line.sort_values(by=__LINE_SORT)
+
+    if write_outputs:
+        freshness = today.strftime("%Y-%m-%d") + " " + latest_data_date.strftime("%Y-%m-%d")
+        write_if_changed(OUTPUT_FRESHNESS, lambda: [freshness])
+        write_csv(latest, OUTPUT_LATEST_DATA, __LATEST_COLUMNS + ["population"], __LATEST_SORT)
+        line_columns = __LINE_COLUMNS + ["population"]
+        write_csv(line, OUTPUT_LINE_DATA, line_columns, __LINE_SORT)
+        write_line_partitions(line, OUTPUT_LINE_PARTITIONS, line_columns, __LINE_SORT)
+    if write_local_outputs:
+        # Only useful on machines that keep `output/` between runs, so off by default (e.g. in CI).
+        # Per-age data plus the all-ages line, which is the only slice with extrapolations.
+        serve.write_vaccinated(vaccinated_with_ages + vaccinated)
+        run_id = history.append_run(
+            {"line": line, "latest": latest, "records": records}, run_time=datetime.now()
+        )
+        st.write(f"Recorded run {run_id}, changes since last run:")
+        st.write(history.changes_since_last_run("line"))
     line["perc"] = line["vaccinated"] / line["population"]
 
     st.write(df)
@@ -116,5 +128,32 @@ def vaccinated_to_df(vaccinated: List[Vaccinated]) -> pd.DataFrame:
     return df
 
 
+# `today` is only used to key the cache, so that interactive runs re-crawl once a day.
+def __crawl(today: date) -> List[Source]:
+    return list(get_data_sources())
+
+
+def __parse_source(source: Source) -> List[Vaccinated]:
+    return list(parse(source, get_sheet(source)))
+
+
+def __deaggregate(vaccinated: List[Vaccinated]) -> List[Vaccinated]:
+    # We don't currently use location data, so just get rid of it all.
+    vaccinated = [v for v in vaccinated if v.slice.location == ALL_LOCATIONS]
+    vaccinated = inference.add_deaggregates(vaccinated)
+    return list(inference.remove_aggregates(vaccinated))
+
+
+def __extrapolate(vaccinated: List[Vaccinated]) -> List[Vaccinated]:
+    return list(inference.add_extrapolations(vaccinated))
+
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Fetch NHS vaccination data and write outputs.")
+    parser.add_argument(
+        "--local-outputs",
+        action="store_true",
+        help="Also record the run history and write the processed data for `data.serve`.",
+    )
+    args = parser.parse_args()
+    main(write_local_outputs=args.local_outputs)
@@ -0,0 +1,58 @@
+import argparse
+import timeit
+import urllib.request
+from typing import Callable, Dict, List
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from data.nhs_crawler import BASE_URLS, parse_index_page
+
+__CHUNK_SIZE = 64 * 1024
+
+
+# The original approach: build the whole tree, then check every tag.
+def parse_full_tree(html: bytes) -> List[str]:
+    return [
+        tag["href"]
+        for tag in BeautifulSoup(html, "html.parser").find_all()
+        if tag.name == "a" and "announced vaccinations" in tag.text
+    ]
+
+
+def parse_strained_tree(html: bytes) -> List[str]:
+    return [
+        tag["href"]
+        for tag in BeautifulSoup(html, "html.parser", parse_only=SoupStrainer("a", href=True))
+        if "announced vaccinations" in tag.text
+    ]
+
+
+def parse_streaming(html: bytes) -> List[str]:
+    chunks = (html[i : i + __CHUNK_SIZE] for i in range(0, len(html), __CHUNK_SIZE))
+    return [source.url for source in parse_index_page(chunks)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parsing of the NHS index pages.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--number", type=int, default=3)
+    args = parser.parse_args()
+
+    approaches: Dict[str, Callable[[bytes], List[str]]] = {
+        "full tree": parse_full_tree,
+        "strained tree": parse_strained_tree,
+        "streaming": parse_streaming,
+    }
+    for base_url in BASE_URLS:
+        html = urllib.request.urlopen(base_url).read()
+        print(f"{base_url} ({len(html) / 1024:.0f} KiB)")
+        # The old approach returned every announced vaccinations link, before filtering by URL.
+        streaming_urls = set(parse_streaming(html))
+        assert streaming_urls <= set(parse_full_tree(html))
+        for name, approach in approaches.items():
+            times = timeit.repeat(lambda: approach(html), repeat=args.repeat, number=args.number)
+            print(f"  {name:>13}: {min(times) / args.number * 1000:7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
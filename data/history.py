@@ -0,0 +1,120 @@
+import argparse
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from data.types import Vaccinated
+
+HISTORY_DIR = Path("output/history")
+# Columns that identify a row in each table. Every other column is a value that can be revised.
+TABLE_KEYS: Dict[str, List[str]] = {
+    "line": ["dose", "group", "real_date"],
+    "latest": ["dose", "group"],
+    "records": ["url", "dose", "group", "location"],
+}
+__RUN_ID_FORMAT = "%Y-%m-%dT%H%M%S"
+
+
+def append_run(
+    tables: Dict[str, pd.DataFrame], run_time: datetime, history_dir: Path = HISTORY_DIR
+) -> str:
+    assert set(tables) == set(TABLE_KEYS), f"Expected tables {set(TABLE_KEYS)}"
+    run_id = run_time.strftime(__RUN_ID_FORMAT)
+    run_dir = history_dir / f"run_date={run_time.date().isoformat()}" / f"run={run_id}"
+    assert not run_dir.exists(), f"History for run {run_id} already exists"
+
+    # Write into a temporary directory then rename, so readers never see half-written runs.
+    tmp_dir = run_dir.with_name(run_dir.name + ".tmp")
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    for table, df in tables.items():
+        df.reset_index(drop=True).to_parquet(tmp_dir / f"{table}.parquet", index=False)
+    tmp_dir.rename(run_dir)
+    return run_id
+
+
+def list_runs(history_dir: Path = HISTORY_DIR) -> List[str]:
+    return sorted(
+        run_dir.name[len("run=") :]
+        for run_dir in history_dir.glob("run_date=*/run=*")
+        if not run_dir.name.endswith(".tmp")
+    )
+
+
+def read_run(run_id: str, table: str, history_dir: Path = HISTORY_DIR) -> pd.DataFrame:
+    run_date = datetime.strptime(run_id, __RUN_ID_FORMAT).date()
+    path = history_dir / f"run_date={run_date.isoformat()}" / f"run={run_id}" / f"{table}.parquet"
+    return pd.read_parquet(path)
+
+
+def diff_runs(
+    old_run_id: str, new_run_id: str, table: str, history_dir: Path = HISTORY_DIR
+) -> pd.DataFrame:
+    keys = TABLE_KEYS[table]
+    old = read_run(old_run_id, table, history_dir)
+    new = read_run(new_run_id, table, history_dir)
+    for run_id, df in [(old_run_id, old), (new_run_id, new)]:
+        duplicates = df[df.duplicated(keys, keep=False)]
+        assert len(duplicates) == 0, f"{keys} aren't unique in {table} of {run_id}:\n{duplicates}"
+    values = [c for c in new.columns if c not in keys and c in old.columns]
+
+    merged = old.merge(new, on=keys, how="outer", suffixes=("_old", "_new"), indicator=True)
+    changed = pd.Series(False, index=merged.index)
+    for value in values:
+        old_value, new_value = merged[f"{value}_old"], merged[f"{value}_new"]
+        changed |= (old_value != new_value) & ~(old_value.isna() & new_value.isna())
+
+    merged["change"] = merged["_merge"].map(
+        {"left_only": "removed", "right_only": "added", "both": "changed"}
+    )
+    merged = merged[(merged["_merge"] != "both") | changed]
+    columns = keys + ["change"] + [f"{v}_{s}" for v in values for s in ["old", "new"]]
+    return merged[columns].sort_values(keys).reset_index(drop=True)
+
+
+def changes_since_last_run(table: str, history_dir: Path = HISTORY_DIR) -> Optional[pd.DataFrame]:
+    runs = list_runs(history_dir)
+    if len(runs) < 2:
+        return None
+    return diff_runs(runs[-2], runs[-1], table, history_dir)
+
+
+def records_to_df(vaccinated: List[Vaccinated]) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "url": [v.source.url for v in vaccinated],
+            "period": [v.source.period for v in vaccinated],
+            "data_date": [v.source.data_date for v in vaccinated],
+            "real_date": [v.source.real_date for v in vaccinated],
+            "dose": [v.slice.dose.csv_str() for v in vaccinated],
+            "group": [v.slice.group.csv_str() for v in vaccinated],
+            "location": [v.slice.location.name or "all" for v in vaccinated],
+            "vaccinated": [int(v.vaccinated) for v in vaccinated],
+        }
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diff the outputs of two pipeline runs.")
+    parser.add_argument("--table", choices=sorted(TABLE_KEYS), default="line")
+    parser.add_argument("--list", action="store_true", help="List all recorded runs.")
+    parser.add_argument("old_run", nargs="?", help="Defaults to the second to last run.")
+    parser.add_argument("new_run", nargs="?", help="Defaults to the last run.")
+    args = parser.parse_args()
+
+    if args.list:
+        print("\n".join(list_runs()))
+        return
+
+    runs = list_runs()
+    old_run = args.old_run or (runs[-2] if len(runs) >= 2 else None)
+    new_run = args.new_run or (runs[-1] if runs else None)
+    assert old_run is not None and new_run is not None, "Need at least two runs to diff"
+    with pd.option_context("display.max_rows", None, "display.width", None):
+        print(f"Changes in {args.table} from {old_run} to {new_run}:")
+        print(diff_runs(old_run, new_run, args.table))
+
+
+if __name__ == "__main__":
+    main()
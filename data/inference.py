@@ -1,10 +1,10 @@
-import itertools
 from collections import defaultdict
 from dataclasses import replace
 from datetime import date, timedelta
 from typing import Iterable, List
 
 from data import population
+from data.rollup import rollup
 from data.types import Source, Vaccinated, Dose, Slice, ALL_AGES, ALL_LOCATIONS
 
 __SLICE_DIMS = ["dose", "group", "location"]
@@ -253,19 +253,7 @@ def deaggregate_with_interpolation(
 
 
 def aggregate_ages(vaccinated: List[Vaccinated]) -> List[Vaccinated]:
-    def key(v: Vaccinated):
-        return str((v.slice.location, v.slice.dose, v.source, v.extrapolated, v.interpolated))
-
-    vaccinated = list(sorted(vaccinated, key=key))
-    vaccinated_grouped_by_age = [list(vs) for _, vs in itertools.groupby(vaccinated, key=key)]
-    aggd = [
-        replace(
-            vs[0],
-            slice=replace(vs[0].slice, group=ALL_AGES),
-            vaccinated=sum(v.vaccinated for v in vs),
-        )
-        for vs in vaccinated_grouped_by_age
-    ]
+    aggd = rollup(vaccinated, ["location", "dose", "source", "extrapolated", "interpolated"])
     import streamlit as st
 
     st.write(len(vaccinated), len(aggd))
@@ -0,0 +1,48 @@
+import json
+from datetime import date
+from pathlib import Path
+from typing import List
+
+import pandas as pd
+
+from data.output import csv_hash, write_csv, write_if_changed
+
+MANIFEST = "manifest.json"
+RECENT = "recent.csv"
+
+
+def write_line_partitions(
+    line: pd.DataFrame, directory: Path, columns: List[str], sort_by: List[str]
+) -> None:
+    # Observed data is split into one file per month, named by a hash of its contents so clients can
+    # cache them forever. The current month and the extrapolations, which change every run, go in a
+    # small mutable file. The manifest lists which files make up the current line data.
+    directory.mkdir(parents=True, exist_ok=True)
+    observed = line[~line["extrapolated"]]
+    current_month = __month(max(observed["real_date"]))
+    months = line["real_date"].apply(__month)
+    is_closed = ~line["extrapolated"] & (months < current_month)
+
+    partitions = []
+    for month, partition in line[is_closed].groupby(months[is_closed], sort=True):
+        name = f"line-{month}.{csv_hash(partition, columns, sort_by)[:12]}.csv"
+        write_csv(partition, directory / name, columns, sort_by)
+        partitions.append(name)
+
+    recent = line[~is_closed]
+    write_csv(recent, directory / RECENT, columns, sort_by)
+
+    for path in directory.glob("line-*.csv"):
+        if path.name not in partitions:
+            path.unlink()
+
+    manifest = {
+        "partitions": partitions,
+        "recent": RECENT,
+        "recent_hash": csv_hash(recent, columns, sort_by)[:12],
+    }
+    write_if_changed(directory / MANIFEST, lambda: [json.dumps(manifest, indent=2) + "\n"])
+
+
+def __month(d: date) -> str:
+    return d.strftime("%Y-%m")
@@ -1,15 +1,16 @@
+import codecs
 import re
 import urllib.request
 from datetime import date, datetime, timedelta
+from html.parser import HTMLParser
 from pathlib import Path
-from typing import Iterable, List
+from typing import Iterable, List, Optional, Pattern
 
 import pandas as pd
-from bs4 import BeautifulSoup
 
 from data.types import Source
 
-__BASE_URLS = [
+BASE_URLS = [
     "https://www.england.nhs.uk/statistics/statistical-work-areas/covid-19-vaccinations/",
     "https://www.england.nhs.uk/statistics/statistical-work-areas/covid-19-vaccinations/covid-19-vaccinations-archive/",
 ]
@@ -26,23 +27,23 @@ __DAILY_DATES_WITH_2ND_SHEET = {
     date(2021, 1, 16),
 }
 __WEEKLY_DATES_WITH_3RD_SHEET_START = date(2021, 3, 4)
+__READ_CHUNK_SIZE = 64 * 1024
 
 
 def get_data_sources() -> Iterable[Source]:
-    urls = [url for base_url in __BASE_URLS for url in __get_sheet_urls(base_url)]
-
-    for url in urls:
-        match = __URL_REGEX.match(url)
-        if match is None:
-            continue
-        assert match, url
-        period = match.group(1).lower()
-        if period == "total":
-            period = "weekly"
-        data_date_str = match.group(2)
-        data_date = datetime.strptime(data_date_str, "%d-%B-%Y").date()
-        delay = timedelta(days=1 if period == "daily" else 4)
-        yield Source(url=url, data_date=data_date, real_date=data_date - delay, period=period)
+    for base_url in BASE_URLS:
+        yield from __get_sheet_sources(base_url)
+
+
+def parse_index_page(html_chunks: Iterable[bytes]) -> List[Source]:
+    # Scans the page as a stream of events rather than building a tree, only looking at anchors.
+    parser = __SheetLinkParser(__URL_REGEX)
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    for chunk in html_chunks:
+        parser.feed(decoder.decode(chunk))
+    parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    return [__source_from_url(url) for url in parser.urls]
 
 
 def get_sheet(source: Source) -> pd.DataFrame:
@@ -66,10 +67,45 @@ def get_sheet(source: Source) -> pd.DataFrame:
     return pd.read_excel(sheet_data, sheet_name=sheet_number)
 
 
-def __get_sheet_urls(base_url: str) -> List[str]:
-    html = urllib.request.urlopen(base_url).read()
-    return [
-        tag["href"]
-        for tag in BeautifulSoup(html, "html.parser").find_all()
-        if tag.name == "a" and "announced vaccinations" in tag.text
-    ]
+def __get_sheet_sources(base_url: str) -> List[Source]:
+    with urllib.request.urlopen(base_url) as response:
+        return parse_index_page(iter(lambda: response.read(__READ_CHUNK_SIZE), b""))
+
+
+def __source_from_url(url: str) -> Source:
+    match = __URL_REGEX.match(url)
+    assert match, url
+    period = match.group(1).lower()
+    if period == "total":
+        period = "weekly"
+    data_date_str = match.group(2)
+    data_date = datetime.strptime(data_date_str, "%d-%B-%Y").date()
+    delay = timedelta(days=1 if period == "daily" else 4)
+    return Source(url=url, data_date=data_date, real_date=data_date - delay, period=period)
+
+
+class __SheetLinkParser(HTMLParser):
+    def __init__(self, url_regex: Pattern):
+        super().__init__()
+        self.urls: List[str] = []
+        self.__url_regex = url_regex
+        self.__href: Optional[str] = None
+        self.__text: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag != "a":
+            return
+        self.__href = dict(attrs).get("href")
+        self.__text = []
+
+    def handle_data(self, data):
+        if self.__href is not None:
+            self.__text.append(data)
+
+    def handle_endtag(self, tag):
+        if tag != "a" or self.__href is None:
+            return
+        text = "".join(self.__text)
+        if "announced vaccinations" in text and self.__url_regex.match(self.__href):
+            self.urls.append(self.__href)
+        self.__href = None
@@ -0,0 +1,84 @@
+import csv
+import hashlib
+import io
+import math
+from datetime import date
+from numbers import Integral, Real
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List
+
+import numpy as np
+import pandas as pd
+
+__READ_CHUNK_SIZE = 64 * 1024
+
+
+def write_csv(df: pd.DataFrame, path: Path, columns: List[str], sort_by: List[str]) -> bool:
+    return write_if_changed(path, lambda: csv_lines(df, columns, sort_by))
+
+
+def csv_hash(df: pd.DataFrame, columns: List[str], sort_by: List[str]) -> str:
+    return __hash_lines(csv_lines(df, columns, sort_by))
+
+
+def csv_lines(df: pd.DataFrame, columns: List[str], sort_by: List[str]) -> Iterator[str]:
+    # Rows are fully sorted and values formatted canonically, so the same data always gives the
+    # same bytes regardless of how it was computed.
+    assert set(sort_by) <= set(columns), f"Can't sort by {sort_by} when writing {columns}"
+    df = df.sort_values(by=sort_by, kind="mergesort")
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    for row in df[columns].itertuples(index=False, name=None):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow([__format(value) for value in row])
+        yield buffer.getvalue()
+
+
+def write_if_changed(path: Path, lines: Callable[[], Iterable[str]]) -> bool:
+    # `lines` is called twice, once to hash and once to write, so that neither pass needs the
+    # whole file in memory. Unchanged files aren't touched at all.
+    if path.is_file() and __hash_file(path) == __hash_lines(lines()):
+        return False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("w", encoding="utf-8", newline="") as f:
+        f.writelines(lines())
+    tmp_path.replace(path)
+    return True
+
+
+def __format(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (bool, np.bool_)):
+        return "True" if value else "False"
+    if isinstance(value, Integral):
+        return str(int(value))
+    if isinstance(value, Real):
+        value = float(value)
+        if math.isnan(value):
+            return ""
+        return str(int(value)) if value.is_integer() else repr(value)
+    if isinstance(value, pd.Timestamp):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def __hash_lines(lines: Iterable[str]) -> str:
+    sha256 = hashlib.sha256()
+    for line in lines:
+        sha256.update(line.encode("utf-8"))
+    return sha256.hexdigest()
+
+
+def __hash_file(path: Path) -> str:
+    sha256 = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(__READ_CHUNK_SIZE), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
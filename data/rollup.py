@@ -0,0 +1,82 @@
+from dataclasses import replace
+from typing import Callable, Dict, Hashable, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from data.types import Vaccinated, ALL_AGES, ALL_DOSES, ALL_LOCATIONS
+
+DIMENSIONS: Dict[str, Callable[[Vaccinated], Hashable]] = {
+    "dose": lambda v: v.slice.dose,
+    "group": lambda v: v.slice.group,
+    "location": lambda v: v.slice.location,
+    "source": lambda v: v.source,
+    "real_date": lambda v: v.source.real_date,
+    "interpolated": lambda v: v.interpolated,
+    "extrapolated": lambda v: v.extrapolated,
+}
+# Slice dimensions that aren't kept in a rollup are set to their "all" value.
+__SLICE_ALL = {"dose": ALL_DOSES, "group": ALL_AGES, "location": ALL_LOCATIONS}
+
+
+def rollup(vaccinated: List[Vaccinated], keep: Sequence[str]) -> List[Vaccinated]:
+    (rolled_up,) = rollups(vaccinated, [keep])
+    return rolled_up
+
+
+def rollups(vaccinated: List[Vaccinated], keeps: Sequence[Sequence[str]]) -> List[List[Vaccinated]]:
+    # Sums over every dimension not in `keep`, once per `keep`. Dimensions are encoded as integer
+    # codes once up front, so each rollup is one hash of the combined codes and some bulk sums.
+    # Rolled up interpolated/extrapolated flags are true if any summed row had them set, and other
+    # rolled up fields (e.g. the source) are taken from the first row of each group.
+    for keep in keeps:
+        unknown = set(keep) - set(DIMENSIONS)
+        assert not unknown, f"Unknown dimensions {unknown}, expected some of {list(DIMENSIONS)}"
+    n = len(vaccinated)
+    if n == 0:
+        return [[] for _ in keeps]
+
+    codes: Dict[str, np.ndarray] = {}
+    cardinalities: Dict[str, int] = {}
+    for dim in {dim for keep in keeps for dim in keep}:
+        get = DIMENSIONS[dim]
+        value_codes: Dict[Hashable, int] = {}
+        codes[dim] = np.fromiter(
+            (value_codes.setdefault(get(v), len(value_codes)) for v in vaccinated),
+            dtype=np.int64,
+            count=n,
+        )
+        cardinalities[dim] = len(value_codes)
+
+    counts = np.fromiter((v.vaccinated for v in vaccinated), dtype=np.float64, count=n)
+    interpolated = np.fromiter((v.interpolated for v in vaccinated), dtype=bool, count=n)
+    extrapolated = np.fromiter((v.extrapolated for v in vaccinated), dtype=bool, count=n)
+
+    results = []
+    for keep in keeps:
+        key = np.zeros(n, dtype=np.int64)
+        for dim in keep:
+            key = key * cardinalities[dim] + codes[dim]
+        group_ids, uniques = pd.factorize(key)
+        num_groups = len(uniques)
+
+        first_row = np.full(num_groups, n, dtype=np.int64)
+        np.minimum.at(first_row, group_ids, np.arange(n))
+        sums = np.bincount(group_ids, weights=counts, minlength=num_groups)
+        any_interpolated = np.bincount(group_ids, weights=interpolated, minlength=num_groups) > 0
+        any_extrapolated = np.bincount(group_ids, weights=extrapolated, minlength=num_groups) > 0
+
+        rolled_up_slice = {dim: all_ for dim, all_ in __SLICE_ALL.items() if dim not in keep}
+        results.append(
+            [
+                replace(
+                    vaccinated[first_row[g]],
+                    slice=replace(vaccinated[first_row[g]].slice, **rolled_up_slice),
+                    vaccinated=int(round(sums[g])),
+                    interpolated=bool(any_interpolated[g]),
+                    extrapolated=bool(any_extrapolated[g]),
+                )
+                for g in range(num_groups)
+            ]
+        )
+    return results
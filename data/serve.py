@@ -0,0 +1,226 @@
+import argparse
+import json
+import pickle
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import DefaultDict, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from data.types import Vaccinated
+
+PROCESSED_VACCINATED = Path("output/vaccinated.pickle")
+# Bounded by size rather than entries, as a single wide query can be a few MB of JSON.
+QUERY_CACHE_BYTES = 64 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class Query:
+    dose: Optional[str] = None
+    group: Optional[str] = None
+    start: Optional[date] = None
+    end: Optional[date] = None
+    extrapolated: Optional[bool] = None
+
+    @staticmethod
+    def from_query_string(query_string: str) -> "Query":
+        params = {k: v[-1] for k, v in parse_qs(query_string).items()}
+        unknown = set(params) - {"dose", "group", "start", "end", "extrapolated"}
+        if unknown:
+            raise ValueError(f"Unknown query parameters: {', '.join(sorted(unknown))}")
+        extrapolated = params.get("extrapolated")
+        if extrapolated is not None and extrapolated.lower() not in ["true", "false"]:
+            raise ValueError(f"extrapolated must be true or false, got {extrapolated}")
+        return Query(
+            dose=params.get("dose"),
+            group=params.get("group"),
+            start=date.fromisoformat(params["start"]) if "start" in params else None,
+            end=date.fromisoformat(params["end"]) if "end" in params else None,
+            extrapolated=extrapolated.lower() == "true" if extrapolated is not None else None,
+        )
+
+
+@dataclass(frozen=True)
+class Row:
+    dose: str
+    group: str
+    real_date: date
+    extrapolated: bool
+    interpolated: bool
+    vaccinated: int
+
+    def to_json(self) -> dict:
+        return {
+            "dose": self.dose,
+            "group": self.group,
+            "real_date": self.real_date.isoformat(),
+            "extrapolated": self.extrapolated,
+            "interpolated": self.interpolated,
+            "vaccinated": self.vaccinated,
+        }
+
+
+# Rows are summed over sources the same way as the CSV outputs, then indexed by (dose, group) and
+# sorted by date so that date ranges are a bisect away.
+class VaccinatedIndex:
+    def __init__(self, vaccinated: List[Vaccinated]):
+        summed: DefaultDict[Tuple[str, str, date, bool], List[int]] = defaultdict(lambda: [0, 0])
+        for v in vaccinated:
+            key = (
+                v.slice.dose.csv_str(),
+                v.slice.group.csv_str(),
+                v.source.real_date,
+                v.extrapolated,
+            )
+            summed[key][0] += int(v.vaccinated)
+            summed[key][1] |= v.interpolated
+
+        rows_by_slice: DefaultDict[Tuple[str, str], List[Row]] = defaultdict(list)
+        for (dose, group, real_date, extrapolated), (total, interpolated) in summed.items():
+            rows_by_slice[(dose, group)].append(
+                Row(dose, group, real_date, extrapolated, bool(interpolated), total)
+            )
+
+        self.__rows: Dict[Tuple[str, str], List[Row]] = {}
+        self.__dates: Dict[Tuple[str, str], List[date]] = {}
+        for slice_, rows in rows_by_slice.items():
+            rows = sorted(rows, key=lambda r: (r.real_date, r.extrapolated))
+            self.__rows[slice_] = rows
+            self.__dates[slice_] = [r.real_date for r in rows]
+
+        self.__cache: "OrderedDict[Query, str]" = OrderedDict()
+        self.__cache_bytes = 0
+        self.__cache_lock = threading.Lock()
+
+    def doses(self) -> List[str]:
+        return sorted({dose for dose, _ in self.__rows})
+
+    def groups(self) -> List[str]:
+        groups = {group for _, group in self.__rows}
+        return sorted(groups, key=lambda g: (g != "all", g))
+
+    def query(self, query: Query) -> str:
+        with self.__cache_lock:
+            if query in self.__cache:
+                self.__cache.move_to_end(query)
+                return self.__cache[query]
+
+        result = self.__query(query)
+        if len(result) > QUERY_CACHE_BYTES:
+            return result
+        with self.__cache_lock:
+            if query not in self.__cache:
+                self.__cache[query] = result
+                self.__cache_bytes += len(result)
+            while self.__cache_bytes > QUERY_CACHE_BYTES:
+                _, evicted = self.__cache.popitem(last=False)
+                self.__cache_bytes -= len(evicted)
+        return result
+
+    def __query(self, query: Query) -> str:
+        rows = []
+        for (dose, group), slice_rows in sorted(self.__rows.items()):
+            if query.dose is not None and dose != query.dose:
+                continue
+            if query.group is not None and group != query.group:
+                continue
+            dates = self.__dates[(dose, group)]
+            lo = bisect_left(dates, query.start) if query.start is not None else 0
+            hi = bisect_right(dates, query.end) if query.end is not None else len(dates)
+            rows.extend(
+                r.to_json()
+                for r in slice_rows[lo:hi]
+                if query.extrapolated is None or r.extrapolated == query.extrapolated
+            )
+        return json.dumps(rows)
+
+
+# Rebuilds the index (and so drops the query cache) whenever the pipeline writes a new run.
+class ReloadingIndex:
+    def __init__(self, path: Path):
+        self.__path = path
+        self.__lock = threading.Lock()
+        self.__mtime: Optional[float] = None
+        self.__index: Optional[VaccinatedIndex] = None
+
+    def get(self) -> VaccinatedIndex:
+        try:
+            mtime = self.__path.stat().st_mtime
+        except FileNotFoundError:
+            # Keep serving the last run, e.g. while outputs are being cleaned between runs.
+            if self.__index is None:
+                raise
+            return self.__index
+        if mtime != self.__mtime:
+            with self.__lock:
+                if mtime != self.__mtime:
+                    print(f"Loading {self.__path}")
+                    self.__index = VaccinatedIndex(read_vaccinated(self.__path))
+                    self.__mtime = mtime
+        assert self.__index is not None
+        return self.__index
+
+
+def write_vaccinated(vaccinated: List[Vaccinated], path: Path = PROCESSED_VACCINATED) -> None:
+    # Write then rename, so that a running server never loads a half-written file.
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_bytes(pickle.dumps(vaccinated))
+    tmp_path.replace(path)
+
+
+def read_vaccinated(path: Path = PROCESSED_VACCINATED) -> List[Vaccinated]:
+    return pickle.loads(path.read_bytes())
+
+
+def make_handler(index: ReloadingIndex):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            try:
+                if url.path == "/vaccinated":
+                    self.__respond(200, index.get().query(Query.from_query_string(url.query)))
+                elif url.path == "/slices":
+                    current = index.get()
+                    body = json.dumps({"doses": current.doses(), "groups": current.groups()})
+                    self.__respond(200, body)
+                else:
+                    self.__respond(404, json.dumps({"error": f"Unknown path {url.path}"}))
+            except ValueError as e:
+                self.__respond(400, json.dumps({"error": str(e)}))
+            except FileNotFoundError as e:
+                self.__respond(503, json.dumps({"error": f"No processed data: {e}"}))
+
+        def __respond(self, status: int, body: str):
+            encoded = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(encoded)))
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            self.wfile.write(encoded)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve processed vaccination data as JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--data", type=Path, default=PROCESSED_VACCINATED)
+    args = parser.parse_args()
+
+    assert args.data.is_file(), f"No processed data at {args.data}, run `python -m data` first"
+    index = ReloadingIndex(args.data)
+    index.get()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(index))
+    print(f"Serving on http://{args.host}:{args.port}/vaccinated")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -118,7 +118,7 @@ function makeBarChart(id, title, csv, annotations, showGroups) {
 }
 
 async function initializeLineCharts(latestDataDate) {
-    const csv = await d3.csv("line.csv")
+    const csv = await getLineData();
     const herdImmunityDate = csv.find(row => {
         if (row.dose !== "2_wait") {
             return false;
@@ -246,6 +246,22 @@ function makeLineChart(id, csv, annotations, limit) {
     });
 }
 
+/**
+ * Fetches the line data from its monthly partitions, which never change and so can be cached
+ * forever, and the small file of recent and extrapolated data.
+ *
+ * @returns Promise<Array<Object>>
+ */
+async function getLineData() {
+    const response = await fetch("line/manifest.json", { cache: "no-cache" });
+    const manifest = await response.json();
+    const urls = manifest.partitions
+        .map(partition => "line/" + partition)
+        .concat(["line/" + manifest.recent + "?v=" + manifest.recent_hash]);
+    const csvs = await Promise.all(urls.map(url => d3.csv(url)));
+    return [].concat(...csvs);
+}
+
 /**
  * @returns Promise<Date>
  */
@@ -1,3 +1,13 @@
-import runpy
+import streamlit as st
 
-runpy.run_module("data", run_name="__main__", alter_sys=True)
+from data.__main__ import main
+
+
+# Stages are cached on their inputs and code, so a rerun only recomputes the stages that changed and
+# everything downstream of them.
+def memoize(f):
+    return st.cache(f, allow_output_mutation=True, suppress_st_warning=True)
+
+
+write_outputs = st.sidebar.checkbox("Write outputs", value=False)
+main(memoize=memoize, write_outputs=write_outputs, write_local_outputs=write_outputs)